@@ -3,7 +3,33 @@
 # * By using, sharing or editing this code you agree with the License terms and conditions.
 # * You can obtain License text at https://github.com/retentioneering/retentioneering-tools/blob/master/LICENSE.md
 
+import numpy as np
 import pandas as pd
+from numba import njit
+
+
+_TMP_SESSION_COL = '__rtn_session_tmp__'
+
+
+@njit(cache=True)
+def _label_sessions(users, eos_mask):
+    # users must be grouped together, events of each user ordered by time
+    labels = np.empty(users.shape[0], dtype=np.int64)
+    session = 0
+    for i in range(users.shape[0]):
+        if i > 0 and users[i] != users[i - 1]:
+            session = 0
+        labels[i] = session
+        if eos_mask[i]:
+            session += 1
+    return labels
+
+
+def _last_in_group(values):
+    # values must be grouped together, marks last row of each group
+    is_last = np.ones(len(values), dtype=bool)
+    is_last[:-1] = values[:-1] != values[1:]
+    return is_last
 
 
 class BaseDataset(object):
@@ -11,19 +37,44 @@ class BaseDataset(object):
         self._obj = pandas_obj
         self.retention_config = {}
 
+    def _get_sorted(self, *,
+                    index_col,
+                    event_col,
+                    time_col):
+        # stable sort by user and time,
+        # sort_values already returns a new frame, no need to copy beforehand
+        data = self._obj.sort_values([index_col, time_col], kind='mergesort')
+
+        # keep events as categorical so groupbys over sorted frame hash int codes,
+        # shifted events inherit the same categories:
+        if not isinstance(data[event_col].dtype, pd.CategoricalDtype):
+            data[event_col] = data[event_col].astype('category')
+
+        return data
+
     def _get_shift(self, *,
                    index_col=None,
-                   event_col=None):
+                   event_col=None,
+                   cols=None):
         index_col = index_col or self.retention_config['user_col']
         event_col = event_col or self.retention_config['event_col']
         time_col = self.retention_config['event_time_col']
+        # columns to get `next_` values for:
+        cols = cols or [event_col, time_col]
+
+        data = self._get_sorted(index_col=index_col,
+                                event_col=event_col,
+                                time_col=time_col)
 
-        data = self._obj.copy()
-        data.sort_values([index_col, time_col], inplace=True)
-        shift = data.groupby(index_col).shift(-1)
+        # frame is sorted by users, so shift within each user is a global shift
+        # with the last event of every user masked, events with missing user
+        # are not chained to each other:
+        is_last = _last_in_group(data[index_col].to_numpy()) | data[index_col].isna().to_numpy()
+        shift = {'next_' + str(col): data[col].shift(-1).mask(is_last) for col in cols}
 
-        data['next_'+event_col] = shift[event_col]
-        data['next_'+str(time_col)] = shift[time_col]
+        # sorted frame is a new one, assign inplace overwriting existing `next_` columns:
+        for col, values in shift.items():
+            data[col] = values
 
         return data
 
@@ -46,8 +97,8 @@ class BaseDataset(object):
             if thresh is None:
                 # add end_of_session event at the end of each string
                 res.sort_values(by=time_col, inplace=True, ascending=False)
-                res[hash('session')] = res.groupby(index_col).cumcount()
-                res_session_ends = res[(res[hash('session')] == 0)].copy()
+                res[_TMP_SESSION_COL] = res.groupby(index_col, sort=False).cumcount()
+                res_session_ends = res[(res[_TMP_SESSION_COL] == 0)].copy()
                 res_session_ends[event_col] = eos_event
                 res_session_ends[time_col] = res_session_ends[time_col] + pd.Timedelta(seconds=1)
 
@@ -62,18 +113,35 @@ class BaseDataset(object):
                     res = res[res[event_col] != eos_event].copy()
 
                 res.sort_values(by=time_col, inplace=True)
-                shift_res = res.groupby(index_col).shift(-1)
 
-                time_delta = pd.to_datetime(shift_res[time_col]) - pd.to_datetime(res[time_col])
-                time_delta = time_delta.dt.total_seconds()
-
-                # get boolean mapper for end_of_session occurrences
-                eos_mask = time_delta > thresh
-
-                # add session column:
-                res[hash('session')] = eos_mask
-                res[hash('session')] = res.groupby(index_col)[hash('session')].cumsum()
-                res[hash('session')] = res.groupby(index_col)[hash('session')].shift(1).fillna(0).map(int).map(str)
+                # group events by users keeping time order within each user:
+                users = res[index_col].astype('category').cat.codes.to_numpy()
+                order = np.argsort(users, kind='stable')
+                users_sorted = users[order]
+
+                # time gaps to the next event of the same user in nanoseconds,
+                # computed from int64 view without materializing next time column,
+                # NaT is replaced with 0 to avoid int64 overflow in subtraction and
+                # gaps touching missing timestamps are never split:
+                no_time = res[time_col].isna().to_numpy()[order]
+                times = res[time_col].to_numpy(dtype='datetime64[ns]').view('i8')[order]
+                times = np.where(no_time, 0, times)
+                time_delta = np.zeros(len(times), dtype=np.int64)
+                time_delta[:-1] = times[1:] - times[:-1]
+                time_delta[:-1][no_time[:-1] | no_time[1:]] = 0
+
+                # get boolean mapper for end_of_session occurrences,
+                # events with missing user (code -1) are never split:
+                eos_sorted = ((time_delta > pd.Timedelta(seconds=thresh).value)
+                              & ~_last_in_group(users_sorted)
+                              & (users_sorted != -1))
+                eos_mask = np.empty(len(res), dtype=bool)
+                eos_mask[order] = eos_sorted
+
+                # add session column, labeling sessions of each user in one pass:
+                session = np.empty(len(res), dtype=np.int64)
+                session[order] = _label_sessions(users_sorted, eos_sorted)
+                res[_TMP_SESSION_COL] = session.astype(str)
 
                 # add end_of_session event if specified:
                 if eos_event is not None:
@@ -84,15 +152,19 @@ class BaseDataset(object):
                     res = pd.concat([res, tmp], ignore_index=True)
                     res = res.sort_values(time_col).reset_index(drop=True)
 
-                res[session_col_arg] = res[index_col].map(str) + '_' + res[hash('session')]
+                res[session_col_arg] = res[index_col].map(str) + '_' + res[_TMP_SESSION_COL]
 
         else:
             # split sessions by event:
-            res[hash('session')] = res[event_col] == by_event
-            res[hash('session')] = res.groupby(index_col)[hash('session')].cumsum().fillna(0).map(int).map(str)
-            res[session_col_arg] = res[index_col].map(str) + '_' + res[hash('session')]
-
-        res.drop(columns=[hash('session')], inplace=True)
+            res[_TMP_SESSION_COL] = res[event_col] == by_event
+            res[_TMP_SESSION_COL] = (res
+                                     .groupby(index_col, sort=False)[_TMP_SESSION_COL]
+                                     .cumsum()
+                                     .astype(np.int64)
+                                     .astype(str))
+            res[session_col_arg] = res[index_col].map(str) + '_' + res[_TMP_SESSION_COL]
+
+        res.drop(columns=[_TMP_SESSION_COL], inplace=True)
         if session_col is None and session_col_arg in res.columns:
             res.drop(columns=[session_col_arg], inplace=True)
         return res
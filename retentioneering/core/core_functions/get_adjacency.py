@@ -3,7 +3,7 @@
 # * By using, sharing or editing this code you agree with the License terms and conditions.
 # * You can obtain License text at https://github.com/retentioneering/retentioneering-tools/blob/master/LICENSE.md
 
-import networkx as nx
+import numpy as np
 import pandas as pd
 
 
@@ -33,7 +33,8 @@ def get_adjacency(self, *,
     Returns
     -------
     Dataframe with number of columns and rows equal to unique number of
-    event_col values.
+    event_col values. Rows and columns follow sorted order of events, or
+    order of their appearance if events can't be compared.
 
     Return type
     -----------
@@ -41,6 +42,14 @@ def get_adjacency(self, *,
     """
     agg = self.get_edgelist(weight_col=weight_col,
                             norm_type=norm_type)
-    graph = nx.DiGraph()
-    graph.add_weighted_edges_from(agg.values)
-    return nx.to_pandas_adjacency(graph)
+    source, target, weight = agg.columns[:3]
+
+    # source and target share categories, so codes index matrix directly:
+    events = agg[source].cat.categories
+    rows = agg[source].cat.codes.to_numpy()
+    cols = agg[target].cat.codes.to_numpy()
+
+    # edgelist has unique pairs of events, so scatter weights directly:
+    matrix = np.zeros((len(events), len(events)))
+    matrix[rows, cols] = agg[weight].to_numpy()
+    return pd.DataFrame(matrix, index=events, columns=events)
@@ -33,7 +33,8 @@ def get_edgelist(self, *,
     Returns
     -------
     Dataframe with number of rows equal to all transitions with weight
-    non-zero weight
+    non-zero weight. Source and target events are categorical with the
+    same categories.
 
     Return type
     -----------
@@ -43,25 +44,22 @@ def get_edgelist(self, *,
         raise ValueError(f'unknown normalization type: {norm_type}')
 
     event_col = self.retention_config['event_col']
-    time_col = self.retention_config['event_time_col']
 
     cols = [event_col, 'next_' + str(event_col)]
 
-    data = self._get_shift().copy()
+    data = self._get_shift(cols=[event_col])
 
     # get aggregation:
     if weight_col is None:
         agg = (data
-               .groupby(cols)[time_col]
-               .count()
-               .reset_index())
-        agg.rename(columns={time_col: edge_attributes}, inplace=True)
+               .groupby(cols, as_index=False, sort=False, observed=True)
+               .size()
+               .rename(columns={'size': edge_attributes}))
     else:
         agg = (data
-               .groupby(cols)[weight_col]
+               .groupby(cols, as_index=False, sort=False, observed=True)[weight_col]
                .nunique()
-               .reset_index())
-        agg.rename(columns={weight_col: edge_attributes}, inplace=True)
+               .rename(columns={weight_col: edge_attributes}))
 
     # apply normalization:
     if norm_type == 'full':
@@ -72,10 +70,25 @@ def get_edgelist(self, *,
 
     if norm_type == 'node':
         if weight_col is None:
-            event_transitions_counter = data.groupby(event_col)[cols[1]].count().to_dict()
-            agg[edge_attributes] /= agg[cols[0]].map(event_transitions_counter)
+            node_totals = data.groupby(cols[0], sort=False, observed=True)[cols[1]].count()
         else:
-            user_counter = data.groupby(cols[0])[weight_col].nunique().to_dict()
-            agg[edge_attributes] /= agg[cols[0]].map(user_counter)
+            node_totals = data.groupby(cols[0], sort=False, observed=True)[weight_col].nunique()
+        # gather totals by categorical codes of source events:
+        source = agg[cols[0]].cat
+        agg[edge_attributes] /= node_totals.reindex(source.categories).to_numpy()[source.codes.to_numpy()]
+
+    # keep source and target events categorical with shared categories
+    # limited to the nodes present in edgelist:
+    nodes = (agg[cols[0]].cat.remove_unused_categories().cat.categories
+             .union(agg[cols[1]].cat.remove_unused_categories().cat.categories, sort=False))
+    try:
+        nodes = nodes.sort_values()
+    except TypeError:
+        # events of mixed types can't be compared, keep order of appearance
+        pass
+    for col in cols:
+        # set_categories recodes values, astype treats reordered unordered
+        # categories as the same dtype and would keep stale codes:
+        agg[col] = agg[col].cat.set_categories(nodes)
 
     return agg
@@ -4,6 +4,7 @@
 # * You can obtain License text at https://github.com/retentioneering/retentioneering-tools/blob/master/LICENSE.md
 
 
+import numpy as np
 import pandas as pd
 
 from retentioneering.visualization import plot_step_matrix
@@ -101,20 +102,20 @@ def step_matrix(self, *,
     weight_col = weight_col or self.retention_config['user_col']
     time_col = self.retention_config['event_time_col']
 
-    data = self._obj.copy()
+    # add termination event to each history (split_sessions returns a copy):
+    data = self.split_sessions(thresh=None,
+                               eos_event='ENDED',
+                               session_col=None)
 
-    # add termination event to each history:
-    data = data.rete.split_sessions(thresh=None,
-                                    eos_event='ENDED',
-                                    session_col=None)
+    # group by int codes of events instead of hashing event names:
+    data[event_col] = data[event_col].astype('category')
 
-    data['event_rank'] = 1
-    data['event_rank'] = data.groupby(weight_col)['event_rank'].cumsum()
+    data['event_rank'] = data.groupby(weight_col, sort=False).cumcount() + 1
 
     # BY HERE WE NEED TO OBTAIN FINAL DIFF piv and piv_targets before sorting, thresholding and plotting:
 
     if groups:
-        data_pos = data[data[weight_col].isin(groups[0])].copy()
+        data_pos = data[data[weight_col].isin(groups[0])]
         if len(data_pos) == 0:
             raise IndexError('Users from positive group are not present in dataset')
         piv_pos, piv_targets_pos, fraction_title, window, targets_plot = \
@@ -127,7 +128,7 @@ def step_matrix(self, *,
                                 centered=centered,
                                 max_steps=max_steps)
 
-        data_neg = data[data[weight_col].isin(groups[1])].copy()
+        data_neg = data[data[weight_col].isin(groups[1])]
         if len(data_pos) == 0:
             raise IndexError('Users from negative group are not present in dataset')
         piv_neg, piv_targets_neg, fraction_title, window, targets_plot = \
@@ -201,9 +202,9 @@ def step_matrix(self, *,
         piv = piv.loc[sorting]
 
     if centered:
-        piv.columns = [f'{int(i) - window - 1}' for i in piv.columns]
+        piv.columns = (piv.columns.astype(int) - window - 1).astype(str)
         if targets:
-            piv_targets.columns = [f'{int(i) - window - 1}' for i in piv_targets.columns]
+            piv_targets.columns = piv.columns
 
     if show_plot:
         plot_step_matrix.step_matrix(piv, piv_targets,
@@ -263,7 +264,6 @@ def _step_matrix_values(*, data, weight_col, event_col, time_col,
 
     from copy import deepcopy
 
-    data = data.copy()
     targets = deepcopy(targets)
 
     # ALIGN DATA IF CENTRAL
@@ -286,6 +286,7 @@ def _step_matrix_values(*, data, weight_col, event_col, time_col,
             raise ValueError(f'Event "{center_event}" not found in the column: "{event_col}"')
 
         # keep only users who have center_event at least N = occurrence times
+        data = data.copy()
         data['occurrence'] = data[event_col] == center_event
         data['occurance_counter'] = data.groupby(weight_col)['occurrence'].cumsum() * data['occurrence']
         users_to_keep = data[data['occurance_counter'] == occurrence][weight_col].unique()
@@ -298,36 +299,34 @@ def _step_matrix_values(*, data, weight_col, event_col, time_col,
             fraction_title = f'({fraction_used:.1f}% of total records)'
         data = data[data[weight_col].isin(users_to_keep)].copy()
 
-        def pad_to_center(x):
-            position = x.loc[(x[event_col] == center_event) &
-                             (x['occurance_counter'] == occurrence)]['event_rank'].min()
-            shift = position - window - 1
-            x['event_rank'] = x['event_rank'] - shift
-            return x
-        data = data.groupby(weight_col).apply(pad_to_center)
+        # broadcast rank of the centered event to all rows of each trajectory:
+        center_mask = (data[event_col] == center_event) & (data['occurance_counter'] == occurrence)
+        position = (data['event_rank']
+                    .where(center_mask)
+                    .groupby(data[weight_col])
+                    .transform('min'))
+        data['event_rank'] = data['event_rank'] - (position - window - 1).astype(int)
         data = data[data['event_rank'] > 0].copy()
 
     # calculate step matrix elements:
-    agg = (data
-           .groupby(['event_rank', event_col])[weight_col]
-           .nunique()
-           .reset_index())
-    agg[weight_col] /= data[weight_col].nunique()
-
-    agg = agg[agg['event_rank'] <= max_steps]
-    agg.columns = ['event_rank', 'event_name', 'freq']
-
-    piv = agg.pivot(index='event_name', columns='event_rank', values='freq').fillna(0)
+    # event_rank is unique within each weight_col value, so the number of unique
+    # weight_col values with given event at given step is the size of the group:
+    step_freq = (data[data['event_rank'] <= max_steps]
+                 .groupby([event_col, 'event_rank'], observed=True)
+                 .size()
+                 .unstack(fill_value=0))
+    step_freq = step_freq / data[weight_col].nunique()
+    step_freq.index = step_freq.index.astype(object)
 
     # add missing cols if number of events < max_steps:
-    piv = pad_cols(piv, max_steps)
+    piv = pad_cols(step_freq, max_steps)
 
     piv.columns.name = None
     piv.index.name = None
 
     # MAKE TERMINATED STATE ACCUMULATED:
     if 'ENDED' in piv.index:
-        piv.loc['ENDED'] = piv.loc['ENDED'].cumsum().fillna(0)
+        piv.loc['ENDED'] = np.cumsum(piv.loc['ENDED'].to_numpy())
 
     # add NOT_STARTED events for centered matrix
     if centered:
@@ -344,32 +343,17 @@ def _step_matrix_values(*, data, weight_col, event_col, time_col,
             if type(i) != list:
                 targets[n] = [i]
 
-        agg_targets = (data
-                       .groupby(['event_rank', event_col])[time_col]
-                       .count()
-                       .reset_index())
-        agg_targets[time_col] /= data[weight_col].nunique()
-        agg_targets.columns = ['event_rank', 'event_name', 'freq']
-
-        agg_targets = agg_targets[agg_targets['event_rank'] <= max_steps]
-
-        piv_targets = agg_targets.pivot(index='event_name', columns='event_rank', values='freq').fillna(0)
-        piv_targets = pad_cols(piv_targets, max_steps)
-
-        # if target is not present in dataset add zeros:
-        for i in targets_flatten:
-            if i not in piv_targets.index:
-                piv_targets.loc[i] = 0
+        piv_targets = pad_cols(step_freq, max_steps)
 
-        piv_targets = piv_targets.loc[targets_flatten].copy()
+        # keep only targets, if target is not present in dataset add zeros:
+        piv_targets = piv_targets.reindex(targets_flatten, fill_value=0)
 
         piv_targets.columns.name = None
         piv_targets.index.name = None
 
         if accumulated == 'only':
             piv_targets.index = map(lambda x: 'ACC_' + x, piv_targets.index)
-            for i in piv_targets.index:
-                piv_targets.loc[i] = piv_targets.loc[i].cumsum().fillna(0)
+            piv_targets = piv_targets.cumsum(axis=1)
 
             # change names is targets list:
             for target in targets:
@@ -377,8 +361,10 @@ def _step_matrix_values(*, data, weight_col, event_col, time_col,
                     target[j] = 'ACC_'+item
 
         if accumulated == 'both':
-            for i in piv_targets.index:
-                piv_targets.loc['ACC_'+i] = piv_targets.loc[i].cumsum().fillna(0)
+            # append all accumulated rows at once:
+            piv_targets_acc = piv_targets.cumsum(axis=1)
+            piv_targets_acc.index = map(lambda x: 'ACC_' + x, piv_targets_acc.index)
+            piv_targets = pd.concat([piv_targets, piv_targets_acc], sort=False)
 
             # add accumulated targets to the list:
             targets_not_acc = deepcopy(targets)
@@ -391,13 +377,15 @@ def _step_matrix_values(*, data, weight_col, event_col, time_col,
 
 
 def _sort_matrix(step_matrix):
-    x = step_matrix.copy()
+    x = step_matrix.to_numpy(dtype=float)
+    used = np.zeros(x.shape[0], dtype=bool)
     order = []
-    for i in x.columns:
-        new_r = x[i].idxmax()
-        order.append(new_r)
-        x = x.drop(new_r)
-        if x.shape[0] == 0:
+    for j in range(x.shape[1]):
+        # pick the row with max value in the column among rows not used yet:
+        r = np.where(used, -np.inf, x[:, j]).argmax()
+        order.append(r)
+        used[r] = True
+        if used.all():
             break
-    order.extend(list(set(step_matrix.index) - set(order)))
-    return step_matrix.loc[order]
+    order.extend(np.flatnonzero(~used))
+    return step_matrix.iloc[order]
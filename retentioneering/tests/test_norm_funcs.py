@@ -6,6 +6,9 @@
 
 
 from math import isclose
+
+import pandas as pd
+
 from .prepare_test_datasets import test_datasets
 
 # global constants
@@ -28,6 +31,11 @@ next_event_col = 'next_' + event_col
 time_col = test_datasets[0]['test_dataset'].rete.retention_config['event_time_col']
 index_col = test_datasets[0]['test_dataset'].rete.retention_config['user_col']
 
+# events of missing users must not form edges with each other:
+data_nan_users = pd.DataFrame({index_col: ['u1', 'u1', None, None, 'u2', 'u2'],
+                               event_col: list('abcdab'),
+                               time_col: pd.date_range('2020-01-01', periods=6, freq='min')})
+
 
 # **********************
 # **** define tests ****
@@ -61,6 +69,13 @@ class TestNormalizationFuncs:
         assert node_norm_by_users(test_dataset)
 
 
+class TestMissingUsers:
+    params = {"test_no_norm_missing_users": [dict(test_dataset=data_nan_users)]}
+
+    def test_no_norm_missing_users(self, test_dataset):
+        assert no_norm_missing_users(test_dataset)
+
+
 # *****************************
 # *** FUNCTIONS DEFINITIONS ***
 # *****************************
@@ -92,7 +107,8 @@ def dict_compare(d1, d2):
 
 # represent result as dictionary for comparison with control dict
 def result_to_dict(result_dataframe):
-    result = result_dataframe.copy()
+    result = result_dataframe.astype({event_col: object,
+                                      next_event_col: object})
     result['bi-gram'] = result[event_col] + '~~~' + \
                         result[next_event_col]
     return dict(zip(result['bi-gram'], result['edge_weight']))
@@ -109,7 +125,8 @@ def no_norm_by_events(test_dataset):
     result_rete = result_to_dict(edgelist)
 
     # obtain expected result using control dataset
-    control_dataset = test_dataset.rete._get_shift()
+    control_dataset = test_dataset.rete._get_shift().astype({event_col: object,
+                                                               next_event_col: object})
     control_dataset['bi-gram'] = control_dataset[event_col] + '~~~' + \
                                  control_dataset[next_event_col]
 
@@ -129,7 +146,8 @@ def full_norm_by_events(test_dataset):
     result_rete = result_to_dict(edgelist)
 
     # obtain expected result using control dataset
-    control_dataset = test_dataset.rete._get_shift()
+    control_dataset = test_dataset.rete._get_shift().astype({event_col: object,
+                                                               next_event_col: object})
     control_dataset['bi-gram'] = control_dataset[event_col] + '~~~' + \
                                  control_dataset[next_event_col]
 
@@ -155,7 +173,8 @@ def node_norm_by_events(test_dataset):
     result_rete = result_to_dict(edgelist)
 
     # obtain expected result using control dataset
-    control_dataset = test_dataset.rete._get_shift()
+    control_dataset = test_dataset.rete._get_shift().astype({event_col: object,
+                                                               next_event_col: object})
     control_dataset['bi-gram'] = control_dataset[event_col] + '~~~' + \
                                  control_dataset[next_event_col]
 
@@ -173,7 +192,7 @@ def node_norm_by_events(test_dataset):
 
     # make sure sum of normalized weights for transitions
     # from each event is equal to 1 (total prob is 1)
-    control_sum = edgelist.groupby(event_col)['edge_weight'].sum()
+    control_sum = edgelist.groupby(event_col, observed=True)['edge_weight'].sum()
     check_control_sum = all(isclose(x, 1, rel_tol=REL_TOL, abs_tol=ABS_TOL)
                             for x in control_sum)
 
@@ -190,7 +209,8 @@ def no_norm_by_users(test_dataset):
     result_rete = result_to_dict(edgelist)
 
     # obtain expected result using control dataset
-    control_dataset = test_dataset.rete._get_shift()
+    control_dataset = test_dataset.rete._get_shift().astype({event_col: object,
+                                                               next_event_col: object})
     control_dataset['bi-gram'] = control_dataset[event_col] + '~~~' + \
                                  control_dataset[next_event_col]
 
@@ -209,7 +229,8 @@ def full_norm_by_users(test_dataset):
     result_rete = result_to_dict(edgelist)
 
     # obtain expected result using control dataset
-    control_dataset = test_dataset.rete._get_shift()
+    control_dataset = test_dataset.rete._get_shift().astype({event_col: object,
+                                                               next_event_col: object})
     control_dataset['bi-gram'] = control_dataset[event_col] + '~~~' + \
                                  control_dataset[next_event_col]
 
@@ -229,7 +250,8 @@ def node_norm_by_users(test_dataset):
     result_rete = result_to_dict(edgelist)
 
     # obtain expected result using control dataset
-    control_dataset = test_dataset.rete._get_shift()
+    control_dataset = test_dataset.rete._get_shift().astype({event_col: object,
+                                                               next_event_col: object})
     control_dataset['bi-gram'] = control_dataset[event_col] + '~~~' + \
                                  control_dataset[next_event_col]
 
@@ -240,3 +262,15 @@ def node_norm_by_users(test_dataset):
     result_test = dict(zip(g_test['bi-gram'], g_test['node_norm']))
 
     return dict_compare(result_rete, result_test)
+
+
+def no_norm_missing_users(test_dataset):
+    """
+    norm_type=None,
+    missing user ids
+    """
+
+    edgelist = test_dataset.rete.get_edgelist(norm_type=None)
+    result_rete = result_to_dict(edgelist)
+
+    return dict_compare(result_rete, {'a~~~b': 2})
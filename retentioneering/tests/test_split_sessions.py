@@ -0,0 +1,135 @@
+# * Copyright (C) 2020 Maxim Godzi, Anatoly Zaytsev, Retentioneering Team
+# * This Source Code Form is subject to the terms of the Retentioneering Software Non-Exclusive License (License)
+# * By using, sharing or editing this code you agree with the License terms and conditions.
+# * You can obtain License text at https://github.com/retentioneering/retentioneering-tools/blob/master/LICENSE.md
+
+
+import pandas as pd
+
+import retentioneering
+from retentioneering import datasets
+
+# import data
+retentioneering.config.update({
+    'event_col': 'event',
+    'event_time_col': 'timestamp',
+    'user_col': 'user_id'
+})
+data = datasets.load_simple_shop()
+
+event_col = 'event'
+time_col = 'timestamp'
+index_col = 'user_id'
+EOS_EVENT = 'session_end'
+
+# add user with a single event:
+SINGLE_EVENT_USER = 1
+data = pd.concat([data, pd.DataFrame({'user_id': [SINGLE_EVENT_USER],
+                                      'event': ['main'],
+                                      'timestamp': ['2020-01-01 00:00:00.000000']})],
+                 ignore_index=True)
+
+# make several users with missing ids:
+data_nan_users = data.copy()
+nan_users = data_nan_users[index_col].drop_duplicates().iloc[:10]
+data_nan_users.loc[data_nan_users[index_col].isin(nan_users), index_col] = None
+
+# make several events with missing timestamps:
+data_nan_times = data.copy()
+data_nan_times.loc[data_nan_times.sample(frac=0.01, random_state=0).index, time_col] = None
+
+test_datasets = [dict(test_dataset=data, thresh=thresh) for thresh in [60, 1800, 86400]]
+test_datasets.append(dict(test_dataset=data_nan_users, thresh=1800))
+test_datasets.append(dict(test_dataset=data_nan_times, thresh=1800))
+
+
+# util function to cycle through parameters for each test
+def pytest_generate_tests(metafunc):
+    # called once per each test function
+    funcarglist = metafunc.cls.params[metafunc.function.__name__]
+    argnames = sorted(funcarglist[0])
+    metafunc.parametrize(
+        argnames, [[funcargs[name] for name in argnames] for funcargs in funcarglist]
+    )
+
+
+class TestSplitSessions:
+    # for each test we would like to run all cases
+    params = {}.fromkeys(["test_split_sessions_thresh",
+                          "test_split_sessions_thresh_eos"], test_datasets)
+
+    def test_split_sessions_thresh(self, test_dataset, thresh):
+        assert split_sessions_thresh(test_dataset, thresh)
+
+    def test_split_sessions_thresh_eos(self, test_dataset, thresh):
+        assert split_sessions_thresh_eos(test_dataset, thresh)
+
+
+# *****************************
+# *** FUNCTIONS DEFINITIONS ***
+# *****************************
+
+
+def control_sessions(test_dataset, thresh):
+    """
+    Session ids and end of session mask obtained with plain pandas groupbys
+    """
+    res = test_dataset.copy()
+    res[time_col] = pd.to_datetime(res[time_col])
+    res = res.sort_values(time_col)
+
+    next_time = res.groupby(index_col)[time_col].shift(-1)
+    eos_mask = (next_time - res[time_col]).dt.total_seconds() > thresh
+
+    session = (eos_mask
+               .groupby(res[index_col]).cumsum()
+               .groupby(res[index_col]).shift(1)
+               .fillna(0)
+               .astype(int))
+    return res[index_col].map(str) + '_' + session.map(str), eos_mask
+
+
+def single_user_session(test_dataset):
+    # user ids become float if some of them are missing
+    return f'{test_dataset[index_col].dtype.type(SINGLE_EVENT_USER)}_0'
+
+
+def split_sessions_thresh(test_dataset, thresh):
+    """
+    thresh=thresh,
+    eos_event=None
+    """
+    result = test_dataset.rete.split_sessions(thresh=thresh)
+    control, _ = control_sessions(test_dataset, thresh)
+
+    check_sessions = result['session_id'].sort_index().equals(control.sort_index())
+
+    # user with a single event has a single session:
+    single = result.loc[result[index_col] == SINGLE_EVENT_USER, 'session_id']
+    check_single = list(single) == [single_user_session(test_dataset)]
+
+    return all([check_sessions, check_single])
+
+
+def split_sessions_thresh_eos(test_dataset, thresh):
+    """
+    thresh=thresh,
+    eos_event=EOS_EVENT
+    """
+    result = test_dataset.rete.split_sessions(thresh=thresh,
+                                              eos_event=EOS_EVENT)
+    control, eos_mask = control_sessions(test_dataset, thresh)
+
+    is_eos = result[event_col] == EOS_EVENT
+
+    # original events keep their session ids:
+    check_sessions = sorted(result.loc[~is_eos, 'session_id']) == sorted(control)
+
+    # one end of session event is added to each session followed by a gap:
+    check_eos = sorted(result.loc[is_eos, 'session_id']) == sorted(control[eos_mask])
+
+    # user with a single event has a single session and no end of session event:
+    single = result.loc[result[index_col] == SINGLE_EVENT_USER]
+    check_single = list(single['session_id']) == [single_user_session(test_dataset)]
+
+    return all([check_sessions, check_eos, check_single])
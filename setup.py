@@ -34,7 +34,8 @@ setup(
         'plotly',
         'tqdm',
         'matplotlib',
-        'umap-learn'
+        'umap-learn',
+        'numba'
     ],
     classifiers=[
         'Development Status :: 5 - Production/Stable',